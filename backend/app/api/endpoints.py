@@ -36,7 +36,7 @@ async def upload_documents(request: Request, files: List[UploadFile] = File(...)
             # Note: process_and_ingest_doc currently processes documents one by one.
             # If it's meant to build a knowledge base for the session, its interaction
             # with in_memory_storage or Qdrant might need to be session-aware.
-            result = process_and_ingest_doc(file_content, file.filename)
+            result = await process_and_ingest_doc(file_content, file.filename)
             ingestion_results.append({"filename": file.filename, "status": "success", "message": result})
         except Exception as e:
             ingestion_results.append({"filename": file.filename, "status": "error", "message": str(e)})
@@ -71,7 +71,7 @@ async def handle_query(request: Request, query: str = Form(...)):
 
     logging.info(f"Session and documents found for session_id '{session_id}'. Proceeding to generate_answer.")
     try:
-        response = generate_answer(query=query, session_id=session_id)
+        response = await generate_answer(query=query, session_id=session_id)
         return response
     except Exception as e:
         logging.error(f"Exception during generate_answer for session_id '{session_id}': {e}", exc_info=True)
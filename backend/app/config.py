@@ -31,4 +31,49 @@ EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 # LLM model on Groq
 LLM_MODEL = "llama3-8b-8192"
 
+# Embeddings via the Hugging Face Inference API (feature-extraction pipeline)
+HF_API_TOKEN = os.getenv("HF_API_TOKEN")
+HF_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+HF_INFERENCE_URL = os.getenv(
+    "HF_INFERENCE_URL",
+    f"https://router.huggingface.co/hf-inference/models/{HF_MODEL_ID}/pipeline/feature-extraction",
+)
+
+# --- Upstream client tuning (Groq, Hugging Face, Qdrant) ---
+# TIMEOUT bounds a single attempt, DEADLINE bounds the whole call including retries.
+# RATE/BURST configure a token bucket per upstream (RATE <= 0 disables limiting).
+# HEDGE_AFTER fires a duplicate request if the first one is still running after that
+# many seconds (0 disables hedging).
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", 30))
+GROQ_DEADLINE = float(os.getenv("GROQ_DEADLINE", 60))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 3))
+GROQ_RATE = float(os.getenv("GROQ_RATE", 5))
+GROQ_BURST = int(os.getenv("GROQ_BURST", 10))
+GROQ_HEDGE_AFTER = float(os.getenv("GROQ_HEDGE_AFTER", 0))
+
+HF_TIMEOUT = float(os.getenv("HF_TIMEOUT", 30))
+HF_DEADLINE = float(os.getenv("HF_DEADLINE", 90))
+HF_MAX_RETRIES = int(os.getenv("HF_MAX_RETRIES", 3))
+HF_RATE = float(os.getenv("HF_RATE", 5))
+HF_BURST = int(os.getenv("HF_BURST", 10))
+HF_HEDGE_AFTER = float(os.getenv("HF_HEDGE_AFTER", 0))
+# Texts per feature-extraction request, so HF_TIMEOUT bounds a fixed-size request and a retry
+# only re-sends one slice of a large document.
+HF_BATCH_SIZE = int(os.getenv("HF_BATCH_SIZE", 64))
+
+QDRANT_TIMEOUT = float(os.getenv("QDRANT_TIMEOUT", 10))
+QDRANT_DEADLINE = float(os.getenv("QDRANT_DEADLINE", 30))
+QDRANT_MAX_RETRIES = int(os.getenv("QDRANT_MAX_RETRIES", 3))
+QDRANT_RATE = float(os.getenv("QDRANT_RATE", 0))
+QDRANT_BURST = int(os.getenv("QDRANT_BURST", 20))
+QDRANT_HEDGE_AFTER = float(os.getenv("QDRANT_HEDGE_AFTER", 0))
+
+# Bulk ingestion: points per upsert request, and how many requests may be in flight at once.
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 256))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("QDRANT_UPSERT_PARALLEL", 4))
+
 # UPLOAD_DIR = "data" # Removed as it's no longer used
\ No newline at end of file
@@ -1,21 +1,22 @@
+import asyncio
 import logging # Ensure logging is imported
 from collections import defaultdict
 from app.services.llm_service import llm_service
 from app.core.state import in_memory_storage # Changed import to app.core.state
-# Import generate_embeddings_batch from ingestion.py
-from app.core.ingestion import extract_text_from_file, text_splitter, generate_embeddings_batch
-from qdrant_client import QdrantClient, models
+# Import generate_embeddings_matrix from ingestion.py
+from app.core.ingestion import extract_text_from_file, text_splitter, generate_embeddings_matrix
+from app.core.chunks import ChunkBatchBuilder
 # from sentence_transformers import SentenceTransformer # Removed
 # from app.config import EMBEDDING_MODEL # Removed
-import uuid
 from typing import List # Ensure List is imported for type hints if not already
 
-# The global qdrant_service is no longer used here directly for search,
-# as generate_answer will build its own temporary Qdrant index for session data.
+# The global qdrant_service is no longer used here directly for search. Session chunks are
+# searched in place through their ChunkBatch vector matrix instead of being copied into a
+# temporary in-memory Qdrant collection.
 # from app.services.qdrant_service import qdrant_service
 
 
-def generate_answer(query: str, session_id: str): # Signature changed
+async def generate_answer(query: str, session_id: str): # Signature changed
     """The main two-phase Q&A logic, now session-specific."""
     print(f"\n--- New Query Received for Session {session_id}: '{query}' ---")
 
@@ -27,25 +28,8 @@ def generate_answer(query: str, session_id: str): # Signature changed
             "error": "No documents in session"
         }
 
-    # Embedding model is no longer loaded locally. Vector size is hardcoded for all-MiniLM-L6-v2.
-    vector_size = 384
-
-    # Initialize in-memory Qdrant client
-    try:
-        qdrant_client = QdrantClient(location=":memory:")
-        # Using a more generic temp collection name as it's per-call, session_id makes it unique enough if needed for debugging
-        temp_collection_name = f"session_query_collection_{session_id}_{str(uuid.uuid4())[:4]}"
-
-        qdrant_client.recreate_collection(
-            collection_name=temp_collection_name,
-            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE), # Use hardcoded vector_size
-        )
-    except Exception as e:
-        logging.error(f"[QA] Failed to initialize in-memory Qdrant for session {session_id}: {e}")
-        return {"error": f"Failed to initialize in-memory Qdrant: {e}"}
-
     # Process files and chunk them
-    all_document_chunks_for_session = []
+    builder = ChunkBatchBuilder()
     for file_info in session_files:
         try:
             # extract_text_from_file returns list of dicts {'page_number': X, 'content': Y}
@@ -62,94 +46,61 @@ def generate_answer(query: str, session_id: str): # Signature changed
                 page_text_chunks = text_splitter.split_text(actual_page_content)
 
                 for para_idx, chunk_text in enumerate(page_text_chunks):
-                    all_document_chunks_for_session.append({
-                        "doc_id": file_info['filename'],
-                        "text": chunk_text,
-                        "page": page_number,
-                        "paragraph": para_idx + 1,
-                    })
+                    builder.add(file_info['filename'], chunk_text, page_number, para_idx + 1)
         except Exception as e:
             print(f"[QA] 🚨 ERROR: Failed processing file {file_info['filename']}: {e}")
             # Optionally skip this file and continue
             continue
 
-    if not all_document_chunks_for_session:
+    if not len(builder):
         return {
             "individual_answers": [],
             "themed_summary": "No text content could be processed from the uploaded documents for this session.",
             "error": "No processable content in session documents"
         }
 
-    # Get embeddings for all chunks using Hugging Face API
-    chunk_texts = [chunk['text'] for chunk in all_document_chunks_for_session]
+    session_chunks = builder.build()
 
-    logging.info(f"[QA] Requesting embeddings for {len(chunk_texts)} chunks using generate_embeddings_batch for session {session_id}...")
+    # Get embeddings for all chunks using Hugging Face API
+    logging.info(f"[QA] Requesting embeddings for {len(session_chunks)} chunks using generate_embeddings_matrix for session {session_id}...")
     try:
-        # Use the new generate_embeddings_batch function
-        all_embeddings = generate_embeddings_batch(chunk_texts)
-
-        # generate_embeddings_batch already checks for len(all_embeddings) == len(texts)
+        # generate_embeddings_matrix already checks that there is one row per text
         # and raises ValueError if mismatch, or RuntimeError for other API issues.
+        session_chunks.set_vectors(await generate_embeddings_matrix(session_chunks.texts()))
 
-        for i, chunk_dict in enumerate(all_document_chunks_for_session):
-            chunk_dict['vector'] = all_embeddings[i] # Add 'vector' key
-
-    except (ValueError, RuntimeError) as e: # Catch errors from generate_embeddings_batch
+    except (ValueError, RuntimeError) as e: # Catch errors from generate_embeddings_matrix
         logging.error(f"[QA] Failed to get document chunk embeddings for session {session_id}: {e}")
         return {"error": f"Failed to get document embeddings: {e}"}
     except Exception as e: # Catch any other unexpected errors
         logging.error(f"[QA] Unexpected error during document embedding for session {session_id}: {e}")
         return {"error": f"Unexpected error during document embedding: {e}"}
 
-    # Upsert points (now with pre-computed vectors) to Qdrant
-    points_to_upsert = []
-    for chunk_with_vector in all_document_chunks_for_session:
-        unique_name = f"{chunk_with_vector['doc_id']}-{chunk_with_vector['page']}-{chunk_with_vector['paragraph']}"
-        point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, unique_name))
-        points_to_upsert.append(models.PointStruct(
-            id=point_id,
-            vector=chunk_with_vector['vector'], # Use pre-computed vector
-            payload=chunk_with_vector
-        ))
-
-    if points_to_upsert:
-        try:
-            qdrant_client.upsert(collection_name=temp_collection_name, points=points_to_upsert, wait=True)
-        except Exception as e:
-            logging.error(f"[QA] Failed to upsert points to in-memory Qdrant for session {session_id}: {e}")
-            return {"error": f"Failed to upsert points to in-memory Qdrant: {e}"}
-
     # 1. Get embedding for the query
-    logging.info(f"[QA] Requesting query embedding using generate_embeddings_batch for session {session_id}...")
+    logging.info(f"[QA] Requesting query embedding using generate_embeddings_matrix for session {session_id}...")
     try:
-        # Use the new generate_embeddings_batch function
-        query_embeddings = generate_embeddings_batch([query]) # Pass query as a list
+        query_embeddings = await generate_embeddings_matrix([query]) # Pass query as a list
 
-        # generate_embeddings_batch returns List[List[float]]. For a single query, this will be [[...]].
-        # It also handles the case where API might return just List[float] for single item list and wraps it.
-        if not query_embeddings or not query_embeddings[0]: # Check if the outer list or inner list is empty
+        # generate_embeddings_matrix returns a (1, dim) matrix for a single query,
+        # including when the API returns a flat vector for a single-item list.
+        if query_embeddings.size == 0:
             logging.error(f"[QA] Failed to get a valid embedding for the query via API for session {session_id}.")
             return {"error": "Failed to generate embedding for the query."}
         query_vector = query_embeddings[0]
-    except (ValueError, RuntimeError) as e: # Catch errors from generate_embeddings_batch
+    except (ValueError, RuntimeError) as e: # Catch errors from generate_embeddings_matrix
         logging.error(f"[QA] Failed to get query embedding for session {session_id}: {e}")
         return {"error": f"Failed to get query embedding: {e}"}
     except Exception as e: # Catch any other unexpected errors
         logging.error(f"[QA] Unexpected error during query embedding for session {session_id}: {e}")
         return {"error": f"Unexpected error during query embedding: {e}"}
 
-    # 2. Retrieve relevant chunks from the temporary session collection
+    # 2. Retrieve relevant chunks by cosine similarity over the session's vector matrix
     try:
-        search_result = qdrant_client.search(
-            collection_name=temp_collection_name,
-            query_vector=query_vector,
-            limit=15, # Keep limit similar to original
-            with_payload=True
-        )
-        retrieved_chunks = [hit.payload for hit in search_result]
+        top_indices = session_chunks.nearest(query_vector, limit=15) # Keep limit similar to original
+        # Only the retrieved chunks are expanded back into dicts for prompt building.
+        retrieved_chunks = [session_chunks.payload(i) for i in top_indices]
     except Exception as e:
-        print(f"[QA] 🚨 ERROR: Failed to search in-memory Qdrant: {e}")
-        return {"error": f"Failed to search in-memory Qdrant: {e}"}
+        print(f"[QA] 🚨 ERROR: Failed to search session chunks: {e}")
+        return {"error": f"Failed to search session chunks: {e}"}
 
     if not retrieved_chunks:
         return {
@@ -164,7 +115,9 @@ def generate_answer(query: str, session_id: str): # Signature changed
         chunks_by_doc[chunk['doc_id']].append(chunk)
 
     # 2. Per-Document Extraction
-    individual_answers = []
+    # Build one prompt per document, then issue the LLM calls concurrently so a single
+    # slow completion does not hold up the others.
+    doc_prompts = []
     for doc_id, chunks in chunks_by_doc.items():
         context = "\n".join([f"Page {c['page']}, Paragraph {c['paragraph']}: {c['text']}" for c in chunks])
         prompt = f"""
@@ -181,8 +134,15 @@ def generate_answer(query: str, session_id: str): # Signature changed
         ---
         User Question: {query}
         """
-        response = llm_service.get_response(prompt, system_prompt="You are a precise extraction assistant.")
-        
+        doc_prompts.append((doc_id, prompt))
+
+    responses = await asyncio.gather(*[
+        llm_service.get_response(prompt, system_prompt="You are a precise extraction assistant.")
+        for _, prompt in doc_prompts
+    ])
+
+    individual_answers = []
+    for (doc_id, _), response in zip(doc_prompts, responses):
         # Simple parsing of the response
         answer_text = response.split("Answer:")[1].split("Citation:")[0].strip()
         citation_text = response.split("Citation:")[1].strip() if "Citation:" in response else "N/A"
@@ -207,7 +167,7 @@ def generate_answer(query: str, session_id: str): # Signature changed
     {individual_answers}
     ---
     """
-    themed_summary = llm_service.get_response(synthesis_prompt, system_prompt="You are a research synthesis expert.")
+    themed_summary = await llm_service.get_response(synthesis_prompt, system_prompt="You are a research synthesis expert.")
 
     return {
         "individual_answers": individual_answers,
@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware # Added import
 from app.api import endpoints
+from app.services.llm_service import llm_service
+from app.services.qdrant_service import qdrant_service
+from app.services.embedding_service import embedding_service
 import os # Re-added os import for environment variables
 # from app.config import UPLOAD_DIR # UPLOAD_DIR is no longer used
 
@@ -34,6 +37,13 @@ app.add_middleware(
 
 app.include_router(endpoints.router)
 
+@app.on_event("shutdown")
+async def close_upstream_clients():
+    # Release the pooled keep-alive connections held by the shared upstream clients.
+    await llm_service.close()
+    await qdrant_service.close()
+    await embedding_service.close()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Document Research & Theme Identification Chatbot API"}
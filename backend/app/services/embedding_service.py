@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+from app.config import (
+    HF_API_TOKEN, HF_INFERENCE_URL, HF_BATCH_SIZE,
+    HF_TIMEOUT, HF_DEADLINE, HF_MAX_RETRIES, HF_RATE, HF_BURST, HF_HEDGE_AFTER,
+)
+from app.services.upstream import Upstream, build_http_client
+
+if not HF_API_TOKEN:
+    logging.warning("HF_API_TOKEN not set in environment variables. Embedding requests might fail for protected models or if rate limits are hit.")
+
+class EmbeddingService:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, batch_size: int = HF_BATCH_SIZE):
+        # Feature extraction is called directly over the shared HTTP/2 pool rather than
+        # through huggingface_hub, so it gets the same pooling and error types as the
+        # other upstreams.
+        self.client = http_client or build_http_client(HF_TIMEOUT)
+        self.url = HF_INFERENCE_URL
+        self.headers = {"Authorization": f"Bearer {HF_API_TOKEN}"} if HF_API_TOKEN else {}
+        self.batch_size = max(1, batch_size)
+        # Feature extraction is idempotent, so it is safe to retry and to hedge.
+        self.upstream = Upstream(
+            "huggingface",
+            timeout=HF_TIMEOUT,
+            deadline=HF_DEADLINE,
+            max_retries=HF_MAX_RETRIES,
+            rate=HF_RATE,
+            burst=HF_BURST,
+            hedge_after=HF_HEDGE_AFTER,
+        )
+
+    async def feature_extraction(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns the API's embeddings for `texts` as one (len(texts), dim) float32 matrix.
+        Texts are sent in requests of at most `batch_size`, each with its own timeout, retries
+        and deadline; the rate limiter paces them when a large document fans out.
+        """
+        slices = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        parts = await asyncio.gather(*[self._embed_slice(part) for part in slices])
+        if not parts:
+            return np.empty((0, 0), dtype=np.float32)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    async def _embed_slice(self, texts: List[str]) -> np.ndarray:
+        async def post():
+            response = await self.client.post(self.url, json={"inputs": texts}, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+
+        embeddings = np.asarray(await self.upstream.call(post), dtype=np.float32)
+        # A single text may come back as a flat vector instead of a 1-row matrix.
+        if embeddings.ndim == 1 and len(texts) == 1:
+            embeddings = embeddings.reshape(1, -1)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings from Hugging Face API, got shape {embeddings.shape}.")
+        return embeddings
+
+    async def close(self):
+        await self.client.aclose()
+
+embedding_service = EmbeddingService()
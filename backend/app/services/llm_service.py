@@ -1,18 +1,47 @@
-from groq import Groq
-from app.config import GROQ_API_KEY, LLM_MODEL
+from typing import Optional
+
+import groq
+import httpx
+from groq import AsyncGroq
+from app.config import (
+    GROQ_API_KEY, LLM_MODEL,
+    GROQ_TIMEOUT, GROQ_DEADLINE, GROQ_MAX_RETRIES, GROQ_RATE, GROQ_BURST, GROQ_HEDGE_AFTER,
+)
+from app.services.upstream import Upstream, build_http_client
 
 class LLMService:
-    def __init__(self):
-        self.client = Groq(api_key=GROQ_API_KEY)
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        # Retries are handled by the Upstream policy, so the SDK's own retry loop is disabled.
+        self.client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            http_client=http_client or build_http_client(GROQ_TIMEOUT),
+            timeout=GROQ_TIMEOUT,
+            max_retries=0,
+        )
+        self.upstream = Upstream(
+            "groq",
+            timeout=GROQ_TIMEOUT,
+            deadline=GROQ_DEADLINE,
+            max_retries=GROQ_MAX_RETRIES,
+            rate=GROQ_RATE,
+            burst=GROQ_BURST,
+            hedge_after=GROQ_HEDGE_AFTER,
+            retry_on=(groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError),
+        )
 
-    def get_response(self, prompt, system_prompt="You are a helpful assistant."):
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            model=LLM_MODEL,
+    async def get_response(self, prompt, system_prompt="You are a helpful assistant."):
+        chat_completion = await self.upstream.call(
+            lambda: self.client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt},
+                ],
+                model=LLM_MODEL,
+            )
         )
         return chat_completion.choices[0].message.content
 
-llm_service = LLMService()
\ No newline at end of file
+    async def close(self):
+        await self.client.close()
+
+llm_service = LLMService()
@@ -1,22 +1,46 @@
-from qdrant_client import QdrantClient, models
+import asyncio
+from qdrant_client import AsyncQdrantClient, models
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 # from sentence_transformers import SentenceTransformer # Removed
-from typing import List # Added for type hinting
+from typing import Iterator, List, Optional # Added for type hinting
 import uuid
 
 # --- STEP 1: Update imports from config ---
 # EMBEDDING_MODEL is no longer used here directly
 from app.config import QDRANT_API_KEY, QDRANT_CLUSTER_URL, QDRANT_COLLECTION_NAME
+from app.config import (
+    QDRANT_TIMEOUT, QDRANT_DEADLINE, QDRANT_MAX_RETRIES, QDRANT_RATE, QDRANT_BURST, QDRANT_HEDGE_AFTER,
+    QDRANT_UPSERT_BATCH_SIZE, QDRANT_UPSERT_PARALLEL,
+)
+from app.services.upstream import Upstream, pool_limits
+from app.core.chunks import ChunkBatch
 # If EMBEDDING_MODEL was only used here, its import can be removed from config too eventually.
 
 
 class QdrantService:
-    def __init__(self):
+    def __init__(self, client: Optional[AsyncQdrantClient] = None):
         # --- STEP 2: Reconfigure the QdrantClient for Cloud ---
         # The QdrantClient is smart enough to use the key when provided.
         # For Qdrant Cloud, we use the 'url' parameter instead of 'host' and 'port'.
-        self.client = QdrantClient(
+        # Extra keyword arguments are forwarded to the underlying httpx client, which gives
+        # us an HTTP/2 keep-alive pool sized like the other upstreams.
+        # The client rounds fractional timeouts up, so QDRANT_TIMEOUT is passed through as-is.
+        self.client = client or AsyncQdrantClient(
             url=QDRANT_CLUSTER_URL, 
             api_key=QDRANT_API_KEY,
+            timeout=QDRANT_TIMEOUT,
+            http2=True,
+            limits=pool_limits(),
+        )
+        self.upstream = Upstream(
+            "qdrant",
+            timeout=QDRANT_TIMEOUT,
+            deadline=QDRANT_DEADLINE,
+            max_retries=QDRANT_MAX_RETRIES,
+            rate=QDRANT_RATE,
+            burst=QDRANT_BURST,
+            hedge_after=QDRANT_HEDGE_AFTER,
+            retry_on=(ResponseHandlingException,),
         )
         # --------------------------------------------------------
 
@@ -25,66 +49,153 @@ class QdrantService:
         # This should ideally be configurable if the model can change.
         self.vector_size = 384
         self.collection_name = QDRANT_COLLECTION_NAME
-        # The setup_collection call will now happen on your remote cluster
-        self.setup_collection()
+        # The async client cannot be awaited at import time, so the collection is set up
+        # on first use instead.
+        self._collection_ready = False
+        self._single_shard = False
+        self._setup_lock = asyncio.Lock()
 
-    def setup_collection(self):
+    async def setup_collection(self):
         """Creates the collection in your Qdrant Cloud cluster if it doesn't exist."""
+        if self._collection_ready:
+            return
+        async with self._setup_lock:
+            if self._collection_ready:
+                return
+            # This request now goes to your cloud instance. Any error other than "missing"
+            # propagates: we must never fall through to creating over an existing collection.
+            exists = await self.upstream.call(lambda: self.client.collection_exists(collection_name=self.collection_name))
+            if exists:
+                print(f"Collection '{self.collection_name}' already exists in Qdrant Cloud.")
+            else:
+                # If it doesn't exist, we create it remotely
+                print(f"Collection '{self.collection_name}' not found. Creating it in Qdrant Cloud...")
+                try:
+                    await self.upstream.call(
+                        lambda: self.client.create_collection(
+                            collection_name=self.collection_name,
+                            vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE),
+                        ),
+                        hedge=False,
+                    )
+                    print("Collection created successfully.")
+                except UnexpectedResponse as e:
+                    # 409: another worker (or a retried attempt of ours) created it first.
+                    if e.status_code != 409:
+                        raise
+                    print(f"Collection '{self.collection_name}' was created concurrently.")
+            # bulk_upsert_chunks can only use a single wait=True barrier on a one-shard collection.
+            info = await self.upstream.call(lambda: self.client.get_collection(collection_name=self.collection_name))
+            self._single_shard = (info.config.params.shard_number or 1) == 1
+            self._collection_ready = True
+
+
+
+    async def bulk_upsert_chunks(self, chunks: ChunkBatch,
+                                 batch_size: int = QDRANT_UPSERT_BATCH_SIZE,
+                                 parallel: int = QDRANT_UPSERT_PARALLEL) -> int:
+        """
+        Streams a pre-embedded ChunkBatch to Qdrant in columnar batches of `batch_size` points,
+        with up to `parallel` batches in flight at once.
+
+        On a single-shard collection the batches are sent with wait=False, so we don't block on
+        index commit for each one, and the last batch is sent with wait=True only after every
+        other batch has been acknowledged. A shard applies updates in order, so that last batch
+        is a consistency barrier for the whole document. On a sharded collection wait=True only
+        covers the shards the last batch touches, so every batch is sent with wait=True instead.
+        Returns the number of points upserted.
+        """
+        if chunks.vectors is None:
+            raise ValueError("bulk_upsert_chunks requires a ChunkBatch with vectors set.")
+        await self.setup_collection()
+        wait_each = not self._single_shard
+        slots = asyncio.Semaphore(max(1, parallel))
+        in_flight = []
+        total = 0
+
+        async def send(batch: models.Batch, wait: bool):
+            # Deterministic point IDs make every batch safe to retry.
+            await self.upstream.call(
+                lambda: self.client.upsert(collection_name=self.collection_name, points=batch, wait=wait),
+                hedge=False,
+            )
+
+        async def send_in_slot(batch: models.Batch):
+            try:
+                await send(batch, wait=wait_each)
+            finally:
+                slots.release()
+
         try:
-            # This request now goes to your cloud instance
-            self.client.get_collection(collection_name=self.collection_name)
-            print(f"Collection '{self.collection_name}' already exists in Qdrant Cloud.")
-        except Exception as e:
-            # If it doesn't exist, we create it remotely
-            print(f"Collection '{self.collection_name}' not found. Creating it in Qdrant Cloud...")
-            self.client.recreate_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(size=self.vector_size, distance=models.Distance.COSINE),
+            # Hold one batch back so we know which one is last. A slot is acquired before the
+            # next batch is built, so at most `parallel + 1` batches are alive at once: up to
+            # `parallel - 1` in flight, the held one and the one just built.
+            batches = self._iter_batches(chunks, batch_size)
+            held = next(batches, None)
+            while held is not None:
+                total += len(held.ids)
+                await slots.acquire()
+                # A failed batch frees its slot too, so check before dispatching more: a failed
+                # ingest must not keep writing the rest of the document.
+                for task in in_flight:
+                    if task.done() and task.exception() is not None:
+                        slots.release()
+                        raise task.exception()
+                following = next(batches, None)
+                if following is None:
+                    slots.release()
+                    break
+                in_flight.append(asyncio.ensure_future(send_in_slot(held)))
+                held = following
+            await asyncio.gather(*in_flight)
+            if held is not None:
+                await send(held, wait=True)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+        return total
+
+    def _iter_batches(self, chunks: ChunkBatch, batch_size: int) -> Iterator[models.Batch]:
+        batch_size = max(1, batch_size)
+        for start in range(0, len(chunks), batch_size):
+            end = min(start + batch_size, len(chunks))
+            # The vector is sent in its own column, so it stays out of the payload. Only this
+            # request's slice of the float32 matrix is converted to JSON-able floats.
+            payloads = [chunks.payload(i) for i in range(start, end)]
+            yield models.Batch(
+                ids=[chunk_point_id(payload) for payload in payloads],
+                vectors=chunks.vectors[start:end].tolist(),
+                payloads=payloads,
             )
-            print("Collection created successfully.")
-
-
-    def upsert_chunks(self, chunks: List[dict]): # Added type hint, chunks now contain 'vector'
-        # Chunks are now expected to have a 'vector' key with pre-computed embeddings.
-        points = []
-        for i, chunk in enumerate(chunks):
-            if 'vector' not in chunk:
-                # Handle error or skip: chunk is missing pre-computed vector
-                print(f"Warning: Chunk at index {i} is missing 'vector'. Skipping.") # Or raise error
-                continue
-
-            # vector = self.embedding_model.encode(chunk['text']).tolist() # Removed: vector is pre-computed
-            
-            # --- STEP 2: THIS IS THE FIX --- (UUID generation logic remains)
-            # Instead of using hash(), we generate a stable and valid UUID.
-            # We use uuid5 which creates a consistent UUID based on a namespace and a name.
-            # This ensures that if you re-upload the same document, you get the same IDs,
-            # which is great for preventing duplicates.
-            unique_name = f"{chunk['doc_id']}-{chunk['page']}-{chunk['paragraph']}"
-            point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, unique_name))
-            # --------------------------------
-
-            points.append(models.PointStruct(
-                id=point_id, # Use the new, valid UUID string
-                vector=chunk['vector'], # Use pre-computed vector from chunk
-                payload=chunk # Payload should not contain the vector itself if it's large,
-                              # but current payload structure is fine.
-            ))
-            
-        if points:
-            # This part is now sending valid data
-            self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
-
-    def search(self, query_vector: List[float], limit=15): # Signature changed
+
+    async def search(self, query_vector: List[float], limit=15): # Signature changed
         # query_vector is now passed directly, no local embedding generation.
         # query_vector = self.embedding_model.encode(query_text).tolist() # Removed
-        search_result = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            limit=limit,
-            with_payload=True
+        await self.setup_collection()
+        # query_points replaces the search endpoint, which current qdrant-client releases no longer provide.
+        search_result = await self.upstream.call(
+            lambda: self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                limit=limit,
+                with_payload=True
+            )
         )
-        return [hit.payload for hit in search_result]
+        return [hit.payload for hit in search_result.points]
+
+    async def close(self):
+        await self.client.close()
+
+def chunk_point_id(chunk: dict) -> str:
+    # --- STEP 2: THIS IS THE FIX --- (UUID generation logic remains)
+    # Instead of using hash(), we generate a stable and valid UUID.
+    # We use uuid5 which creates a consistent UUID based on a namespace and a name.
+    # This ensures that if you re-upload the same document, you get the same IDs,
+    # which is great for preventing duplicates.
+    unique_name = f"{chunk['doc_id']}-{chunk['page']}-{chunk['paragraph']}"
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, unique_name))
 
 # This instance will now connect to your cloud cluster when the app starts.
 qdrant_service = QdrantService()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+import httpx
+
+from app.config import HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY
+
+T = TypeVar("T")
+
+# Status codes worth retrying: request timeout, too early, rate limited and transient server errors.
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def build_http_client(timeout: float) -> httpx.AsyncClient:
+    """Creates an HTTP/2 keep-alive pooled client shared by all calls to one upstream."""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=timeout,
+        limits=pool_limits(),
+    )
+
+
+class UpstreamTimeout(RuntimeError):
+    """Raised when a call to an upstream runs past its overall deadline."""
+
+
+class TokenBucket:
+    """
+    Async token bucket. Callers wait for a token instead of failing, so bursts above
+    `rate` are queued and drained at the configured rate. A rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Upstream:
+    """
+    Call policy for one upstream service: token-bucket rate limiting, a per-attempt
+    timeout, an overall deadline, retries with full-jitter exponential backoff and
+    optional hedged requests for tail latency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        timeout: float,
+        deadline: float,
+        max_retries: int,
+        rate: float,
+        burst: int,
+        hedge_after: float = 0,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        backoff_base: float = 0.25,
+        backoff_max: float = 8.0,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.retry_on = retry_on
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = TokenBucket(rate, burst)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], *, hedge: Optional[bool] = None) -> T:
+        """
+        Runs `fn` under this upstream's policy. `fn` must build a fresh awaitable on every
+        invocation since it may be retried or hedged. Hedging is on by default when
+        `hedge_after` is configured; pass hedge=False for calls that are not idempotent.
+        """
+        use_hedge = self.hedge_after > 0 if hedge is None else (hedge and self.hedge_after > 0)
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                if use_hedge:
+                    return await self._hedged(fn, give_up_at)
+                return await self._attempt(fn, give_up_at)
+            except UpstreamTimeout:
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise UpstreamTimeout(f"{self.name}: attempt timed out after {self.timeout}s") from e
+                    raise
+                delay = self._backoff(attempt, e)
+                if loop.time() + delay >= give_up_at:
+                    raise UpstreamTimeout(f"{self.name}: deadline of {self.deadline}s exceeded") from e
+                logging.warning(f"[{self.name}] Attempt {attempt + 1} failed ({type(e).__name__}: {e}). Retrying in {delay:.2f}s.")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], give_up_at: float) -> T:
+        # Waiting for a token is bounded only by the overall deadline, so a queued burst
+        # slows down instead of burning its per-attempt timeout in the queue.
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self.limiter.acquire(), max(0.0, give_up_at - loop.time()))
+        except asyncio.TimeoutError:
+            raise UpstreamTimeout(f"{self.name}: deadline of {self.deadline}s exceeded waiting for rate limit") from None
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            raise UpstreamTimeout(f"{self.name}: deadline of {self.deadline}s exceeded")
+        return await asyncio.wait_for(fn(), min(self.timeout, remaining))
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], give_up_at: float) -> T:
+        # Start the primary; if it has not finished after `hedge_after`, race a duplicate
+        # against it and keep whichever succeeds first. Each leg gets its own token and
+        # its own per-attempt timeout.
+        tasks = [asyncio.ensure_future(self._attempt(fn, give_up_at))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                logging.info(f"[{self.name}] No response after {self.hedge_after}s, sending hedged request.")
+                tasks.append(asyncio.ensure_future(self._attempt(fn, give_up_at)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _is_retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError, ConnectionError)):
+            return True
+        if self.retry_on and isinstance(exc, self.retry_on):
+            return True
+        return _status_code(exc) in RETRYABLE_STATUS_CODES
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: uniform over [0, base * 2^attempt], capped.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # SDKs expose the HTTP status differently: `.status_code` (Groq, Qdrant), `.response.status_code`
+    # (httpx.HTTPStatusError) or `.status` (aiohttp.ClientResponseError).
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(exc, "headers", None)
+    if not headers:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
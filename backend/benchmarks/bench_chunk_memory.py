@@ -0,0 +1,80 @@
+"""
+Memory held by a document's chunks in the original dict-of-lists form (one dict per chunk with
+a Python list of floats under 'vector') against a columnar ChunkBatch.
+
+Both forms start from the same texts. The float32 embedding matrix, as returned by the
+embedding API, is allocated inside the measurement for both: the dict form can drop it after
+`.tolist()`, while ChunkBatch keeps it as its vector column, so each side is charged for what
+it actually keeps alive.
+
+    cd backend && python -m benchmarks.bench_chunk_memory --chunks 5000
+"""
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from app.core.chunks import ChunkBatchBuilder
+
+
+def dict_of_lists(doc_id, texts, embed):
+    chunks = [
+        {"doc_id": doc_id, "text": text, "page": i // 8 + 1, "paragraph": i % 8 + 1}
+        for i, text in enumerate(texts)
+    ]
+    vectors = embed().tolist()
+    for chunk, vector in zip(chunks, vectors):
+        chunk["vector"] = vector
+    return chunks
+
+
+def chunk_batch(doc_id, texts, embed):
+    builder = ChunkBatchBuilder()
+    for i, text in enumerate(texts):
+        builder.add(doc_id, text, i // 8 + 1, i % 8 + 1)
+    chunks = builder.build()
+    embeddings = embed()
+    chunks.set_vectors(embeddings)
+    # The vector column is the embedding output itself, not a copy.
+    assert chunks.vectors is embeddings
+    return chunks
+
+
+def measure(build, *args):
+    gc.collect()
+    tracemalloc.start()
+    result = build(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chars", type=int, default=900, help="characters per chunk")
+    args = parser.parse_args()
+
+    # Distinct strings, like the text splitter produces.
+    texts = [f"{i:06d}" + "x" * (args.chars - 6) for i in range(args.chunks)]
+
+    def embed():
+        return np.random.default_rng(0).random((args.chunks, args.dim), dtype=np.float32)
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.chars} chars each")
+    rows = []
+    for name, build in [("dict-of-lists", dict_of_lists), ("ChunkBatch", chunk_batch)]:
+        result, current, peak = measure(build, "benchmark.pdf", texts, embed)
+        rows.append((name, current, peak))
+        print(f"  {name:<14} retained {current / args.chunks / 1024:6.2f} KB/chunk   "
+              f"peak {peak / 1e6:7.1f} MB")
+        if name == "ChunkBatch":
+            print(f"  {'':<14} ChunkBatch.nbytes cross-check: {result.nbytes / args.chunks / 1024:6.2f} KB/chunk")
+        del result
+    print(f"  retained-memory ratio: {rows[0][1] / rows[1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
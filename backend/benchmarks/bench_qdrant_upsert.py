@@ -0,0 +1,125 @@
+"""
+Upsert throughput: one wait=True request per document (the original upsert_chunks path)
+against QdrantService.bulk_upsert_chunks, both through the real AsyncQdrantClient REST
+serialization, talking to a local fake Qdrant.
+
+The fake server models Qdrant's update queue: a request costs a round trip plus a per-point
+parse cost, updates are applied one after another at a per-point cost, and a wait=True
+response is held until the queue has applied that update.
+
+    cd backend && python -m benchmarks.bench_qdrant_upsert --chunks 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
+
+from app.core.chunks import ChunkBatchBuilder
+from app.services.qdrant_service import QdrantService, chunk_point_id
+from app.services.upstream import Upstream
+
+
+class FakeQdrant:
+    def __init__(self, rtt: float, parse_per_point: float, apply_per_point: float):
+        self.rtt = rtt
+        self.parse_per_point = parse_per_point
+        self.apply_per_point = apply_per_point
+        self.applied_until = 0.0
+        self.points = 0
+        self.bytes_received = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        body = json.loads(request.content)
+        self.bytes_received += len(request.content)
+        n = len(body["batch"]["ids"]) if "batch" in body else len(body["points"])
+        self.points += n
+        await asyncio.sleep(self.rtt / 2 + n * self.parse_per_point)
+        # Updates are applied in arrival order, one after another.
+        self.applied_until = max(loop.time(), self.applied_until) + n * self.apply_per_point
+        finish = self.applied_until
+        if request.url.params.get("wait") == "true":
+            await asyncio.sleep(max(0.0, finish - loop.time()))
+        await asyncio.sleep(self.rtt / 2)
+        status = "completed" if request.url.params.get("wait") == "true" else "acknowledged"
+        return httpx.Response(200, json={"result": {"operation_id": 0, "status": status}, "status": "ok", "time": 0})
+
+
+def make_chunks(n: int, dim: int):
+    builder = ChunkBatchBuilder()
+    for i in range(n):
+        builder.add("benchmark.pdf", "lorem ipsum " * 80, i // 8 + 1, i % 8 + 1)
+    chunks = builder.build()
+    chunks.set_vectors(np.random.default_rng(0).random((n, dim), dtype=np.float32))
+    return chunks
+
+
+def make_service(server: FakeQdrant) -> QdrantService:
+    client = AsyncQdrantClient(
+        url="http://fake-qdrant:6333",
+        check_compatibility=False,
+        transport=httpx.MockTransport(server.handle),
+    )
+    service = QdrantService(client=client)
+    service.collection_name = "benchmark"
+    service.upstream = Upstream("qdrant-bench", timeout=600, deadline=600, max_retries=0, rate=0, burst=1)
+    service._collection_ready = True
+    service._single_shard = True
+    return service
+
+
+async def single_request_upsert(service: QdrantService, chunks) -> int:
+    # The original path: one dict per chunk, the vector also stored in the payload, and a
+    # single PointStruct list sent with wait=True.
+    points = []
+    for i in range(len(chunks)):
+        chunk = chunks.payload(i)
+        chunk["vector"] = chunks.vectors[i].tolist()
+        points.append(models.PointStruct(id=chunk_point_id(chunk), vector=chunk["vector"], payload=chunk))
+    await service.client.upsert(collection_name=service.collection_name, points=points, wait=True)
+    return len(points)
+
+
+async def run(args):
+    chunks = make_chunks(args.chunks, args.dim)
+    variants = [
+        ("single request, wait=True", lambda service: single_request_upsert(service, chunks)),
+        (f"bulk, batch={args.batch_size}, parallel={args.parallel}",
+         lambda service: service.bulk_upsert_chunks(chunks, batch_size=args.batch_size, parallel=args.parallel)),
+    ]
+    print(f"{args.chunks} chunks x {args.dim} dims, rtt={args.rtt_ms}ms, "
+          f"parse={args.parse_us}us/pt, apply={args.apply_us}us/pt")
+    for name, upsert in variants:
+        timings = []
+        for _ in range(args.repeat):
+            server = FakeQdrant(args.rtt_ms / 1000, args.parse_us / 1e6, args.apply_us / 1e6)
+            service = make_service(server)
+            started = time.perf_counter()
+            total = await upsert(service)
+            timings.append(time.perf_counter() - started)
+            await service.close()
+            assert total == server.points == args.chunks
+        best = min(timings)
+        print(f"  {name:<40} {best * 1000:8.1f} ms  {args.chunks / best:9.0f} points/s  "
+              f"{server.bytes_received / 1e6:6.1f} MB sent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--parse-us", type=float, default=10.0)
+    parser.add_argument("--apply-us", type=float, default=30.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+
+# app.services.llm_service builds a module-level AsyncGroq client on import, which
+# requires an API key. Tests never reach the real API, so any placeholder will do.
+os.environ.setdefault("GROQ_API_KEY", "test-key")
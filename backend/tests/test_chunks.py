@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.core.chunks import ChunkBatchBuilder
+
+
+def build(rows):
+    builder = ChunkBatchBuilder()
+    for row in rows:
+        builder.add(*row)
+    return builder.build()
+
+
+def test_texts_are_addressed_by_offsets():
+    chunks = build([("a.pdf", "first", 1, 1), ("a.pdf", "", 1, 2), ("b.txt", "thïrd", 2, 1)])
+
+    assert len(chunks) == 3
+    assert chunks.text_buffer == "firstthïrd"
+    assert chunks.text_offsets.tolist() == [0, 5, 5, 10]
+    assert [chunks.text(i) for i in range(3)] == ["first", "", "thïrd"]
+    assert chunks.texts() == ["first", "", "thïrd"]
+
+
+def test_payload_matches_the_dict_form():
+    chunks = build([("a.pdf", "first", 1, 1), ("b.txt", "second", 4, 2)])
+
+    assert chunks.doc_ids == ["a.pdf", "b.txt"]
+    assert chunks.payload(1) == {"doc_id": "b.txt", "text": "second", "page": 4, "paragraph": 2}
+    assert all(type(v) in (str, int) for v in chunks.payload(0).values())
+
+
+def test_builder_replaces_duplicate_chunks_in_place():
+    chunks = build([
+        ("a.pdf", "old", 1, 1),
+        ("a.pdf", "other", 1, 2),
+        ("a.pdf", "new", 1, 1),
+        ("b.pdf", "same position, other doc", 1, 1),
+    ])
+
+    assert chunks.texts() == ["new", "other", "same position, other doc"]
+    assert chunks.pages.tolist() == [1, 1, 1]
+    assert chunks.paragraphs.tolist() == [1, 2, 1]
+
+
+def test_set_vectors_does_not_copy_float32_matrices():
+    chunks = build([("a.pdf", "x", 1, 1), ("a.pdf", "y", 1, 2)])
+    vectors = np.ones((2, 3), dtype=np.float32)
+
+    chunks.set_vectors(vectors)
+
+    assert chunks.vectors is vectors
+
+
+def test_set_vectors_converts_other_dtypes():
+    chunks = build([("a.pdf", "x", 1, 1)])
+    chunks.set_vectors([[1, 2, 3]])
+
+    assert chunks.vectors.dtype == np.float32
+    assert chunks.vectors.shape == (1, 3)
+
+
+@pytest.mark.parametrize("shape", [(3, 4), (2,), (2, 4, 1)])
+def test_set_vectors_rejects_wrong_shapes(shape):
+    chunks = build([("a.pdf", "x", 1, 1), ("a.pdf", "y", 1, 2)])
+
+    with pytest.raises(ValueError):
+        chunks.set_vectors(np.zeros(shape, dtype=np.float32))
+
+
+def test_nearest_orders_by_cosine_similarity():
+    chunks = build([("a.pdf", str(i), 1, i) for i in range(5)])
+    chunks.set_vectors(np.array([
+        [1.0, 0.0],    # same direction as the query
+        [0.0, 0.0],    # zero-norm row scores 0 instead of NaN
+        [-1.0, 0.0],   # opposite direction
+        [10.0, 10.0],  # 45 degrees, magnitude must not matter
+        [-0.1, 1.0],   # almost orthogonal, slightly away from the query
+    ], dtype=np.float32))
+
+    assert chunks.nearest([2.0, 0.0], limit=5).tolist() == [0, 3, 1, 4, 2]
+    assert chunks.nearest([2.0, 0.0], limit=2).tolist() == [0, 3]
+    assert chunks.nearest([2.0, 0.0], limit=50).tolist() == [0, 3, 1, 4, 2]
+
+
+def test_nearest_edge_cases():
+    empty = ChunkBatchBuilder().build()
+    empty.set_vectors(np.zeros((0, 2), dtype=np.float32))
+    assert empty.nearest([1.0, 0.0], limit=5).tolist() == []
+
+    chunks = build([("a.pdf", "x", 1, 1)])
+    with pytest.raises(ValueError):
+        chunks.nearest([1.0], limit=1)
+    chunks.set_vectors(np.ones((1, 2), dtype=np.float32))
+    assert chunks.nearest([0.0, 0.0], limit=1).tolist() == [0]
@@ -0,0 +1,102 @@
+import json
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.embedding_service import EmbeddingService
+
+
+def make_service(responses, batch_size=64):
+    requests = []
+
+    def handler(request):
+        requests.append((time.monotonic(), request))
+        return responses[min(len(requests), len(responses)) - 1]
+
+    service = EmbeddingService(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), batch_size=batch_size)
+    service.upstream.backoff_base = 0.01
+    return service, requests
+
+
+async def test_feature_extraction_returns_float32_matrix():
+    service, requests = make_service([httpx.Response(200, json=[[0.5, 1.0], [2.0, 3.0]])])
+
+    embeddings = await service.feature_extraction(["a", "b"])
+
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (2, 2)
+    assert json.loads(requests[0][1].content) == {"inputs": ["a", "b"]}
+
+
+async def test_feature_extraction_splits_large_inputs_into_bounded_requests():
+    requests = []
+
+    def handler(request):
+        inputs = json.loads(request.content)["inputs"]
+        requests.append(inputs)
+        # Echo each text's index so the order of the combined matrix can be checked.
+        return httpx.Response(200, json=[[float(text), 0.0] for text in inputs])
+
+    service = EmbeddingService(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), batch_size=4)
+    texts = [str(i) for i in range(10)]
+
+    embeddings = await service.feature_extraction(texts)
+
+    assert sorted(len(inputs) for inputs in requests) == [2, 4, 4]
+    assert embeddings.dtype == np.float32
+    assert embeddings[:, 0].tolist() == list(range(10))
+
+
+async def test_feature_extraction_retries_only_the_failed_slice():
+    requests = []
+
+    def handler(request):
+        inputs = json.loads(request.content)["inputs"]
+        requests.append(inputs)
+        if inputs == ["c"] and requests.count(["c"]) == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=[[1.0] for _ in inputs])
+
+    service = EmbeddingService(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), batch_size=2)
+
+    embeddings = await service.feature_extraction(["a", "b", "c"])
+
+    assert sorted(requests) == [["a", "b"], ["c"], ["c"]]
+    assert embeddings.shape == (3, 1)
+
+
+async def test_feature_extraction_rejects_mismatched_responses():
+    service, _ = make_service([httpx.Response(200, json=[[1.0]])])
+
+    with pytest.raises(ValueError):
+        await service.feature_extraction(["a", "b"])
+
+
+@pytest.mark.parametrize("status", [429, 503])
+async def test_feature_extraction_retries_busy_api(status):
+    service, requests = make_service([
+        httpx.Response(status, headers={"Retry-After": "0.1"}),
+        httpx.Response(200, json=[[1.0, 2.0]]),
+    ])
+
+    embeddings = await service.feature_extraction(["a"])
+
+    assert embeddings.tolist() == [[1.0, 2.0]]
+    assert len(requests) == 2
+    assert requests[1][0] - requests[0][0] >= 0.09
+
+
+async def test_feature_extraction_does_not_retry_bad_requests():
+    service, requests = make_service([httpx.Response(400, json={"error": "bad input"})])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await service.feature_extraction(["a"])
+    assert len(requests) == 1
+
+
+async def test_close_releases_pool():
+    service, _ = make_service([httpx.Response(200, json=[[1.0]])])
+    await service.close()
+    assert service.client.is_closed
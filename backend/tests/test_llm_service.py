@@ -0,0 +1,83 @@
+import json
+import time
+
+import groq
+import httpx
+import pytest
+
+from app.services.llm_service import LLMService
+
+
+def completion(content):
+    return httpx.Response(200, json={
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test-model",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+    })
+
+
+def make_service(responses):
+    requests = []
+
+    def handler(request):
+        requests.append((time.monotonic(), request))
+        return responses[min(len(requests), len(responses)) - 1]
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service = LLMService(http_client=http_client)
+    service.upstream.backoff_base = 0.01
+    return service, http_client, requests
+
+
+async def test_get_response_uses_the_pooled_client_and_retries_429_after_retry_after():
+    service, http_client, requests = make_service([
+        httpx.Response(429, headers={"Retry-After": "0.2"}, json={"error": {"message": "rate limited"}}),
+        completion("hello"),
+    ])
+
+    assert service.client._client is http_client
+    assert service.client.max_retries == 0
+
+    answer = await service.get_response("hi", system_prompt="be brief")
+
+    assert answer == "hello"
+    # Exactly one retry: the SDK's own retry loop would have added more requests.
+    assert len(requests) == 2
+    assert requests[1][0] - requests[0][0] >= 0.2
+    body = json.loads(requests[1][1].content)
+    assert body["messages"] == [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": "hi"},
+    ]
+
+
+async def test_get_response_retries_server_errors():
+    service, _, requests = make_service([
+        httpx.Response(503, json={"error": {"message": "unavailable"}}),
+        completion("ok"),
+    ])
+
+    assert await service.get_response("hi") == "ok"
+    assert len(requests) == 2
+
+
+async def test_get_response_does_not_retry_bad_requests():
+    service, _, requests = make_service([httpx.Response(400, json={"error": {"message": "bad request"}})])
+
+    with pytest.raises(groq.BadRequestError):
+        await service.get_response("hi")
+    assert len(requests) == 1
+
+
+async def test_close_closes_the_http_client():
+    service, http_client, _ = make_service([completion("ok")])
+
+    await service.close()
+
+    assert http_client.is_closed
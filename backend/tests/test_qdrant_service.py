@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient, models
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+from app.core.chunks import ChunkBatchBuilder
+from app.services.qdrant_service import QdrantService
+from app.services.upstream import Upstream
+
+
+def make_service(client):
+    service = QdrantService(client=client)
+    service.collection_name = "test_collection"
+    service.upstream = Upstream("qdrant-test", timeout=1.0, deadline=2.0, max_retries=1, rate=0, burst=1, backoff_base=0.01)
+    return service
+
+
+async def test_setup_creates_missing_collection():
+    service = make_service(AsyncQdrantClient(location=":memory:"))
+    await service.setup_collection()
+    assert await service.client.collection_exists("test_collection")
+
+
+async def test_setup_keeps_existing_collection():
+    client = AsyncQdrantClient(location=":memory:")
+    await client.create_collection("test_collection", vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE))
+    await client.upsert("test_collection", points=[models.PointStruct(id=1, vector=[0.1] * 384, payload={})])
+    service = make_service(client)
+
+    await service.setup_collection()
+    assert (await client.count("test_collection")).count == 1
+
+
+class UnavailableQdrant:
+    def __init__(self):
+        self.created = False
+
+    async def collection_exists(self, collection_name):
+        raise UnexpectedResponse(503, "Service Unavailable", b"", httpx.Headers())
+
+    async def create_collection(self, **kwargs):
+        self.created = True
+
+
+async def test_setup_propagates_errors_without_creating():
+    client = UnavailableQdrant()
+    service = make_service(client)
+
+    with pytest.raises(UnexpectedResponse):
+        await service.setup_collection()
+    assert not client.created
+    assert not service._collection_ready
+
+
+def make_chunks(n, dim=4):
+    builder = ChunkBatchBuilder()
+    for i in range(n):
+        builder.add("doc.pdf", f"chunk {i}", i // 10 + 1, i % 10 + 1)
+    chunks = builder.build()
+    chunks.set_vectors(np.random.default_rng(0).random((n, dim), dtype=np.float32))
+    return chunks
+
+
+class RecordingQdrant:
+    """Fake client that records each upsert's start/finish order and its wait flag."""
+
+    def __init__(self, shard_number=1, fail_on=None):
+        self.shard_number = shard_number
+        self.fail_on = fail_on
+        self.events = []
+        self.upserts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def collection_exists(self, collection_name):
+        return True
+
+    async def get_collection(self, collection_name):
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(shard_number=self.shard_number)))
+
+    async def upsert(self, collection_name, points, wait):
+        index = len(self.upserts)
+        self.upserts.append((len(points.ids), wait))
+        self.events.append(("start", index))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.02 if index % 2 else 0.01)
+            if index == self.fail_on:
+                raise ValueError("bad batch")
+        finally:
+            self.active -= 1
+        self.events.append(("done", index))
+
+
+async def test_bulk_upsert_only_final_batch_waits_after_all_others_acknowledged():
+    client = RecordingQdrant()
+    service = make_service(client)
+
+    assert await service.bulk_upsert_chunks(make_chunks(95), batch_size=10, parallel=3) == 95
+
+    assert [size for size, _ in client.upserts] == [10] * 9 + [5]
+    assert [wait for _, wait in client.upserts] == [False] * 9 + [True]
+    last = len(client.upserts) - 1
+    final_start = client.events.index(("start", last))
+    assert all(("done", i) in client.events[:final_start] for i in range(last))
+    assert client.max_active <= 3
+
+
+async def test_bulk_upsert_waits_on_every_batch_for_sharded_collections():
+    client = RecordingQdrant(shard_number=3)
+    service = make_service(client)
+
+    await service.bulk_upsert_chunks(make_chunks(30), batch_size=10, parallel=2)
+
+    assert [wait for _, wait in client.upserts] == [True, True, True]
+
+
+async def test_bulk_upsert_failure_stops_dispatch_and_awaits_in_flight_batches():
+    client = RecordingQdrant(fail_on=1)
+    service = make_service(client)
+    service.upstream.max_retries = 0
+
+    with pytest.raises(ValueError):
+        await service.bulk_upsert_chunks(make_chunks(1000), batch_size=10, parallel=4)
+
+    # Only the batches already in flight when batch 1 failed may have been sent.
+    assert len(client.upserts) <= client.fail_on + 4 + 1
+    assert all(not wait for _, wait in client.upserts)
+    assert client.active == 0
+    assert not any(task for task in asyncio.all_tasks() if task is not asyncio.current_task())
+
+
+async def test_bulk_upsert_into_memory_qdrant_keeps_vectors_out_of_payload():
+    service = make_service(AsyncQdrantClient(location=":memory:"))
+    service.vector_size = 4
+
+    await service.bulk_upsert_chunks(make_chunks(25), batch_size=10, parallel=2)
+
+    assert (await service.client.count("test_collection", exact=True)).count == 25
+    points, _ = await service.client.scroll("test_collection", limit=1, with_payload=True)
+    assert set(points[0].payload) == {"doc_id", "text", "page", "paragraph"}
+
+
+async def test_search_returns_payloads_best_first():
+    service = make_service(AsyncQdrantClient(location=":memory:"))
+    service.vector_size = 4
+    chunks = make_chunks(12)
+    await service.bulk_upsert_chunks(chunks, batch_size=5, parallel=2)
+
+    results = await service.search(chunks.vectors[7].tolist(), limit=3)
+
+    assert len(results) == 3
+    assert results[0] == chunks.payload(7)
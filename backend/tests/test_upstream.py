@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.upstream import TokenBucket, Upstream, UpstreamTimeout
+
+
+def make_upstream(**overrides):
+    options = dict(timeout=1.0, deadline=5.0, max_retries=3, rate=0, burst=1, backoff_base=0.01)
+    options.update(overrides)
+    return Upstream("test", **options)
+
+
+def fake_server(responses):
+    """An httpx client whose transport answers with `responses` in order and records request times."""
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        return responses[min(len(calls), len(responses)) - 1]
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://fake"), calls
+
+
+async def get_ok(client):
+    response = await client.get("/")
+    response.raise_for_status()
+    return response.json()
+
+
+@pytest.mark.parametrize("status", [429, 503])
+async def test_retries_and_honours_retry_after(status):
+    client, calls = fake_server([
+        httpx.Response(status, headers={"Retry-After": "0.2"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+    upstream = make_upstream()
+
+    assert await upstream.call(lambda: get_ok(client)) == {"ok": True}
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.19
+
+
+async def test_does_not_retry_client_errors():
+    client, calls = fake_server([httpx.Response(404)])
+    upstream = make_upstream()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(lambda: get_ok(client))
+    assert len(calls) == 1
+
+
+async def test_retries_on_status_attribute():
+    # aiohttp-style errors expose the status as `.status` and headers directly on the exception.
+    class ResponseError(Exception):
+        def __init__(self, status):
+            self.status = status
+            self.headers = {"Retry-After": "0"}
+
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ResponseError(503)
+        return "ok"
+
+    assert await make_upstream().call(flaky) == "ok"
+    assert len(attempts) == 2
+
+
+async def test_gives_up_at_deadline():
+    async def stall():
+        await asyncio.sleep(10)
+
+    upstream = make_upstream(timeout=0.1, deadline=0.35, max_retries=10)
+    started = time.monotonic()
+    with pytest.raises(UpstreamTimeout):
+        await upstream.call(stall)
+    assert time.monotonic() - started < 0.5
+
+
+async def test_hedged_request_wins_when_primary_stalls():
+    legs = []
+
+    async def primary_stalls():
+        legs.append(1)
+        await asyncio.sleep(1 if len(legs) == 1 else 0.01)
+        return len(legs)
+
+    upstream = make_upstream(timeout=2.0, max_retries=0, hedge_after=0.05)
+    started = time.monotonic()
+    assert await upstream.call(primary_stalls) == 2
+    assert time.monotonic() - started < 0.5
+
+
+async def test_hedging_can_be_disabled_per_call():
+    legs = []
+
+    async def slow():
+        legs.append(1)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    upstream = make_upstream(hedge_after=0.01)
+    assert await upstream.call(slow, hedge=False) == "done"
+    assert len(legs) == 1
+
+
+async def test_token_bucket_queues_a_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+    started = time.monotonic()
+    await asyncio.gather(*[bucket.acquire() for _ in range(6)])
+    # Two tokens are available immediately, the other four are drained at 20/s.
+    assert 0.18 <= time.monotonic() - started < 0.5
+
+
+async def test_burst_waiting_for_tokens_does_not_time_out():
+    upstream = make_upstream(rate=10, burst=1, timeout=0.3, deadline=2.0, max_retries=0)
+
+    async def fast():
+        return "ok"
+
+    results = await asyncio.gather(*[upstream.call(fast) for _ in range(4)], return_exceptions=True)
+    assert results == ["ok"] * 4